@@ -12,17 +12,36 @@ DayByDay — Streamlit single-file app
 # ---------------------------
 # Imports
 # ---------------------------
+import copy
+import gc
+import hmac
 import os
 import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import islice
 from pathlib import Path
-from datetime import datetime
+from typing import Optional
+from datetime import datetime, timezone
 import re
 import uuid
+from urllib.parse import quote
 
 from dotenv import load_dotenv
 import streamlit as st
 import bcrypt
 
+# Faster JSON if available; falls back to the stdlib
+try:
+    import orjson
+    HAS_ORJSON = True
+except Exception:
+    orjson = None
+    HAS_ORJSON = False
+
 # Gemini AI import attempt
 try:
     import google.generativeai as genai
@@ -31,6 +50,40 @@ except Exception:
     genai = None
     HAS_GENAI = False
 
+# ---------------------------
+# Garbage collection
+# ---------------------------
+# Every interaction reruns the whole script and allocates lots of short-lived
+# dicts (projects, tasks, parsed JSON). Raise the gen-0 threshold so the
+# cyclic collector doesn't keep walking them mid-run.
+gc.set_threshold(50000, 10, 10)
+
+# Full collections are rare but still needed so long-lived sessions don't grow forever
+FULL_GC_INTERVAL = 300  # seconds
+
+@st.cache_resource(show_spinner=False)
+def _gc_state():
+    # Shared across reruns and sessions (module globals are reset on every rerun)
+    return {"last_full": time.monotonic()}
+
+@contextmanager
+def gc_paused():
+    """Disable the cyclic GC for one script run, then collect once on the way out."""
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+            state = _gc_state()
+            now = time.monotonic()
+            if now - state["last_full"] >= FULL_GC_INTERVAL:
+                state["last_full"] = now
+                gc.collect()
+            else:
+                gc.collect(1)
+
 # ---------------------------
 # Page config
 # ---------------------------
@@ -43,49 +96,162 @@ st.set_page_config(
 # ---------------------------
 # Load environment
 # ---------------------------
-load_dotenv()
-
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+@dataclass(frozen=True)
+class Config:
+    gemini_api_key: Optional[str]
+    gemini_model: str
+    data_dir: Path
+    allow_signup: bool
+
+@st.cache_resource(show_spinner=False)
+def get_config() -> Config:
+    """Read .env and the environment once per process, not on every rerun."""
+    load_dotenv()
+    return Config(
+        gemini_api_key=os.getenv("GEMINI_API_KEY"),
+        gemini_model=os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+        # All app data in a dedicated folder (easy to keep private / .gitignore)
+        data_dir=Path(os.getenv("DATA_DIR", "data")),
+        # Optional: disable signup for other people (set ALLOW_SIGNUP=false in .env)
+        allow_signup=os.getenv("ALLOW_SIGNUP", "true").lower() == "true",
+    )
 
-# All app data in a dedicated folder (easy to keep private / .gitignore)
-DATA_DIR = Path(os.getenv("DATA_DIR", "data"))
-DATA_DIR.mkdir(parents=True, exist_ok=True)
+CONFIG = get_config()
+GEMINI_API_KEY = CONFIG.gemini_api_key
+GEMINI_MODEL = CONFIG.gemini_model
+DATA_DIR = CONFIG.data_dir
+ALLOW_SIGNUP = CONFIG.allow_signup
 
-# Optional: disable signup for other people (set ALLOW_SIGNUP=false in .env)
-ALLOW_SIGNUP = os.getenv("ALLOW_SIGNUP", "true").lower() == "true"
+# Per-session limits so session_state can't grow without bound
+MAX_TASKS_PER_DAY = 50
+MAX_CHAT_HISTORY = 200
 
 # ---------------------------
 # File paths
 # ---------------------------
 USERS_FILE = DATA_DIR / "users.json"
-PROJECTS_FILE = DATA_DIR / "projects.json"
+PROJECTS_FILE = DATA_DIR / "projects.json"  # legacy: all users in one file
+PROJECTS_DIR = DATA_DIR / "projects"          # one file per user
 
 # ---------------------------
 # File helpers
 # ---------------------------
 def ensure_file(p: Path, default):
-    if not p.exists():
-        with open(p, "w", encoding="utf-8") as f:
-            json.dump(default, f, indent=2, ensure_ascii=False)
+    # O_EXCL creates and checks in one call; an existing file is left alone
+    try:
+        fd = os.open(p, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        return
+    with os.fdopen(fd, "wb") as f:
+        f.write(dumps_json(default, indent=True))
+
+def dumps_json(obj, indent=False) -> bytes:
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def loads_json(data: bytes):
+    return orjson.loads(data) if HAS_ORJSON else json.loads(data)
 
 def read_json(p: Path, default=None):
     default = default or {}
     try:
-        with open(p, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(p, "rb") as f:
+            return loads_json(f.read())
     except Exception:
         return default
 
+def fsync_dir(d: Path):
+    """Make a rename inside `d` durable. No-op where directories can't be opened (Windows)."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    try:
+        fd = os.open(d, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
 def write_json(p: Path, obj):
     tmp = p.with_suffix(".tmp")
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(obj, f, indent=2, ensure_ascii=False)
+    with open(tmp, "wb") as f:
+        f.write(dumps_json(obj, indent=True))
+        f.flush()
+        os.fsync(f.fileno())
+    tmp.replace(p)
+    fsync_dir(p.parent)
+
+def read_ndjson(p: Path):
+    """Return (rows, clean). clean is False if the last line was cut off mid-write
+    or any line failed to parse, i.e. the file should be rewritten."""
+    rows = []
+    truncated = corrupt = False
+    try:
+        with open(p, "rb") as f:
+            for line in f:
+                truncated = not line.endswith(b"\n")
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(loads_json(line))
+                except ValueError:
+                    corrupt = True
+    except OSError:
+        pass
+    return rows, not (truncated or corrupt)
+
+def append_ndjson(p: Path, rows):
+    with open(p, "ab", buffering=64 * 1024) as f:
+        for row in rows:
+            f.write(dumps_json(row) + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def write_ndjson(p: Path, rows):
+    tmp = p.with_suffix(".tmp")
+    with open(tmp, "wb", buffering=64 * 1024) as f:
+        for row in rows:
+            f.write(dumps_json(row) + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
     tmp.replace(p)
+    fsync_dir(p.parent)
+
+def user_projects_file(username: str) -> Path:
+    # Percent-encode so usernames can't escape PROJECTS_DIR
+    return PROJECTS_DIR / f"{quote(username, safe='')}.ndjson"
+
+def migrate_projects_file():
+    """One-time split of the shared projects.json into per-user NDJSON logs."""
+    if PROJECTS_FILE.exists():
+        allp = read_json(PROJECTS_FILE, {})
+        for username, projects in allp.items():
+            user_file = user_projects_file(username)
+            if not user_file.exists():
+                write_ndjson(user_file, projects.values())
+        PROJECTS_FILE.replace(PROJECTS_FILE.with_suffix(".json.bak"))
+
+@st.cache_resource(show_spinner=False)
+def _bootstrap():
+    """One-time process setup: data files, migrations and the Gemini client."""
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    ensure_file(USERS_FILE, {})
+    PROJECTS_DIR.mkdir(parents=True, exist_ok=True)
+    migrate_projects_file()
+    if HAS_GENAI and GEMINI_API_KEY:
+        try:
+            genai.configure(api_key=GEMINI_API_KEY)
+        except Exception:
+            pass
+    return True
 
-# Ensure files exist
-ensure_file(USERS_FILE, {})
-ensure_file(PROJECTS_FILE, {})
+_bootstrap()
 
 # ---------------------------
 # Password helpers (bcrypt)
@@ -102,21 +268,28 @@ def verify_password(password: str, password_hash: str) -> bool:
 # ---------------------------
 # Session state defaults (per browser session)
 # ---------------------------
-if "page" not in st.session_state:
-    st.session_state.page = "login"
-if "user" not in st.session_state:
-    st.session_state.user = None
-if "project" not in st.session_state:
-    st.session_state.project = {
+def empty_project():
+    return {
         "title": "",
         "description": "",
         "tasks": [[] for _ in range(8)],
+        "next_id": 0,
         "generated_at": None,
         "updated_at": None,
         "raw_plan": ""
     }
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+
+if "page" not in st.session_state:
+    st.session_state.page = "login"
+if "user" not in st.session_state:
+    st.session_state.user = None
+if "project" not in st.session_state:
+    st.session_state.project = empty_project()
+if not isinstance(st.session_state.get("chat_history"), deque):
+    # Bounded: the oldest messages fall off once MAX_CHAT_HISTORY is reached
+    st.session_state.chat_history = deque(
+        st.session_state.get("chat_history") or [], maxlen=MAX_CHAT_HISTORY
+    )
 if "ask_context" not in st.session_state:
     st.session_state.ask_context = None
 if "show_planner" not in st.session_state:
@@ -125,10 +298,26 @@ if "show_planner" not in st.session_state:
 # ---------------------------
 # Local Auth
 # ---------------------------
+@st.cache_data(show_spinner=False)
+def _load_users_cached(mtime_ns: int):
+    # mtime_ns is only the cache key; a changed file gets a fresh entry
+    return read_json(USERS_FILE, {})
+
+def load_users():
+    try:
+        mtime_ns = USERS_FILE.stat().st_mtime_ns
+    except OSError:
+        return {}
+    return _load_users_cached(mtime_ns)
+
+def save_users(users: dict):
+    write_json(USERS_FILE, users)
+    _load_users_cached.clear()
+
 def signup_local(username: str, password: str):
     if not username:
         return False, "Username required."
-    users = read_json(USERS_FILE, {})
+    users = load_users()
 
     if username in users:
         return False, "Username already exists."
@@ -139,11 +328,11 @@ def signup_local(username: str, password: str):
         "created_at": datetime.utcnow().isoformat(),
         "id": str(uuid.uuid4())
     }
-    write_json(USERS_FILE, users)
+    save_users(users)
     return True, "Account created."
 
 def login_local(username: str, password: str):
-    users = read_json(USERS_FILE, {})
+    users = load_users()
     u = users.get(username)
     if not u:
         return False, "User not found."
@@ -154,45 +343,121 @@ def login_local(username: str, password: str):
             return False, "Incorrect password."
     else:
         # Old version had "password" stored in plain text
-        if u.get("password") != password:
+        stored = u.get("password")
+        if not isinstance(stored, str) or not hmac.compare_digest(
+            stored.encode("utf-8"), password.encode("utf-8")
+        ):
             return False, "Incorrect password."
         # On successful login, upgrade to hashed password
         u["password_hash"] = hash_password(password)
         u.pop("password", None)
         users[username] = u
-        write_json(USERS_FILE, users)
+        save_users(users)
 
     return True, "Logged in."
 
 # ---------------------------
 # Project persistence
 # ---------------------------
+def project_timestamp(value) -> float:
+    """Epoch seconds for a stored timestamp; older projects saved ISO strings."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and value:
+        try:
+            dt = datetime.fromisoformat(value)
+        except ValueError:
+            return 0.0
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
+    return 0.0
+
+def format_timestamp(value) -> str:
+    ts = project_timestamp(value)
+    if not ts:
+        return ""
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(timespec="seconds")
+
+def project_sort_key(project: dict) -> float:
+    return project_timestamp(project.get("updated_at") or project.get("generated_at"))
+
+# Rewrite a user's log once it holds this many times more lines than projects
+PROJECTS_COMPACT_RATIO = 4
+PROJECTS_COMPACT_MIN_LINES = 64
+
+@st.cache_resource(show_spinner=False)
+def _projects_store():
+    # username -> (mtime_ns, projects, line_count, clean). Write-through, so saves
+    # only append to the log instead of re-reading it. Shared by every session,
+    # so stored projects are never handed out for editing.
+    return {}
+
+def _load_projects_entry(username: str):
+    user_file = user_projects_file(username)
+    try:
+        mtime = user_file.stat().st_mtime_ns
+    except OSError:
+        return None, {}, 0, True
+    store = _projects_store()
+    cached = store.get(username)
+    if cached and cached[0] == mtime:
+        return cached
+    rows, clean = read_ndjson(user_file)
+    # Later lines are newer saves of the same project
+    projects = {row["title"]: row for row in rows if isinstance(row, dict) and "title" in row}
+    entry = (mtime, projects, len(rows), clean)
+    store[username] = entry
+    return entry
+
 def load_user_projects(username: str):
-    allp = read_json(PROJECTS_FILE, {})
-    return allp.get(username, {})
+    """The cached projects, shared by every session: deep-copy one before editing it."""
+    return _load_projects_entry(username)[1]
 
 def save_user_project(username: str, project: dict):
-    allp = read_json(PROJECTS_FILE, {})
-    if username not in allp:
-        allp[username] = {}
-    project["updated_at"] = datetime.utcnow().isoformat()
-    allp[username][project["title"]] = project
-    write_json(PROJECTS_FILE, allp)
+    user_file = user_projects_file(username)
+    _, projects, lines, clean = _load_projects_entry(username)
+    project["updated_at"] = time.time()
+    projects = dict(projects)
+    projects[project["title"]] = copy.deepcopy(project)
+    limit = max(PROJECTS_COMPACT_MIN_LINES, PROJECTS_COMPACT_RATIO * len(projects))
+    if not clean or lines + 1 > limit:
+        write_ndjson(user_file, projects.values())
+        lines = len(projects)
+    else:
+        append_ndjson(user_file, [project])
+        lines += 1
+    _projects_store()[username] = (user_file.stat().st_mtime_ns, projects, lines, True)
+
+def mark_project_dirty():
+    """Defer saving the current project to the end of this script run."""
+    st.session_state["_project_dirty"] = True
+    invalidate_project_context()
+
+def invalidate_project_context():
+    st.session_state.pop("_project_context", None)
+
+def flush_project():
+    """Write the current project once if a widget handler marked it dirty."""
+    if not st.session_state.get("_project_dirty"):
+        return
+    st.session_state["_project_dirty"] = False
+    if not st.session_state.user:
+        return
+    save_user_project(st.session_state.user, st.session_state.project)
 
 # ---------------------------
 # Gemini AI helpers
 # ---------------------------
-if HAS_GENAI and GEMINI_API_KEY:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-    except Exception:
-        pass
+# Sent once as the model's system instruction instead of being pasted into every prompt
+SYSTEM_PROMPT = "You are DayBot, an expert project planner."
 
-def call_gemini_text(prompt, max_tokens=400):
-    if not HAS_GENAI or not GEMINI_API_KEY:
-        return False, "Gemini AI not configured."
+@st.cache_resource(show_spinner=False)
+def get_gemini_model(model_name: str, system: str):
+    return genai.GenerativeModel(model_name, system_instruction=system)
+
+def _generate_text(model, prompt):
     try:
-        model = genai.GenerativeModel(GEMINI_MODEL)
         resp = model.generate_content(prompt)
         if resp and getattr(resp, "text", None):
             return True, resp.text.strip()
@@ -201,33 +466,92 @@ def call_gemini_text(prompt, max_tokens=400):
         # In production you would log the exception somewhere private
         return False, "DayBot is currently unavailable. Please try again."
 
+def call_gemini_text(prompt, max_tokens=400, *, system=SYSTEM_PROMPT):
+    if not HAS_GENAI or not GEMINI_API_KEY:
+        return False, "Gemini AI not configured."
+    return _generate_text(get_gemini_model(GEMINI_MODEL, system), prompt)
+
+def call_gemini_many(prompts, *, system=SYSTEM_PROMPT):
+    """Run independent prompts concurrently; returns [(ok, text), ...] in prompt order."""
+    if not HAS_GENAI or not GEMINI_API_KEY:
+        return [(False, "Gemini AI not configured.")] * len(prompts)
+    if not prompts:
+        return []
+    # Resolve the cached model here; worker threads have no Streamlit script context
+    model = get_gemini_model(GEMINI_MODEL, system)
+    with ThreadPoolExecutor(max_workers=len(prompts)) as pool:
+        return list(pool.map(lambda p: _generate_text(model, p), prompts))
+
+class GeminiCallError(Exception):
+    """Raised inside the cached call so failed replies are never cached."""
+
+def stream_gemini_text(prompt, *, system=SYSTEM_PROMPT):
+    """Yield the reply in chunks as Gemini produces it. Raises GeminiCallError on failure."""
+    if not HAS_GENAI or not GEMINI_API_KEY:
+        raise GeminiCallError("Gemini AI not configured.")
+    try:
+        model = get_gemini_model(GEMINI_MODEL, system)
+        for chunk in model.generate_content(prompt, stream=True):
+            text = getattr(chunk, "text", "")
+            if text:
+                yield text
+    except Exception:
+        raise GeminiCallError("DayBot is currently unavailable. Please try again.")
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_gemini_text(prompt: str, max_tokens: int, system: str) -> str:
+    ok, text = call_gemini_text(prompt, max_tokens, system=system)
+    if not ok:
+        raise GeminiCallError(text)
+    return text
+
+def call_gemini_text_cached(prompt, max_tokens=400, *, system=SYSTEM_PROMPT):
+    """Like call_gemini_text, but an identical prompt within the hour is answered from cache."""
+    try:
+        return True, _cached_gemini_text(prompt, max_tokens, system)
+    except GeminiCallError as e:
+        return False, str(e)
+
 # ---------------------------
 # Task parsing helpers
 # ---------------------------
+# These run over a few KB of text and at most a few hundred tasks, so they stay
+# plain Python + precompiled regex (no JIT). The slow parts of a rerun are the
+# Gemini round-trip and the JSON files, which is why those are cached/batched.
+# Bullets / numbering in front of a task line ("- ", "• ", "1. ", "2) ")
+_TASK_LEAD_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+# "Day 3:", "**Day 3:**", "### Day 3 - Build" section headers in AI plans
+_DAY_HEADER_RE = re.compile(
+    r"^[ \t#*]*Day\s*(\d+)[ \t*]*(?:[:\-–][ \t*]*|$)", re.IGNORECASE | re.MULTILINE
+)
+
+def parse_task_lines(text: str):
+    """Non-empty lines of `text` with bullets / numbering stripped."""
+    lines = []
+    for line in text.splitlines():
+        line = _TASK_LEAD_RE.sub("", line).strip()
+        if line:
+            lines.append(line)
+    return lines
+
 def parse_plan_to_tasks(plan_text: str):
     """Parse a 'Day 1: ... Day 8:' style text into 8 lists of task dicts."""
     days = [[] for _ in range(8)]
     if not plan_text:
         return days
 
-    # Split into blocks starting at "Day X"
-    blocks = re.split(r"(?=Day\s*\d+[:\-])", plan_text, flags=re.IGNORECASE)
-    for i in range(1, 9):
-        block = next(
-            (b for b in blocks if re.match(fr"Day\s*{i}\b", b, flags=re.IGNORECASE)),
-            ""
-        )
-        if not block:
+    # One scan for every "Day X:" header; each day's text runs to the next header
+    headers = list(_DAY_HEADER_RE.finditer(plan_text))
+    seen = set()
+    for n, m in enumerate(headers):
+        day = int(m.group(1))
+        # Only the first block for each day counts
+        if not 1 <= day <= 8 or day in seen:
             continue
-
-        content = re.sub(fr"Day\s*{i}[:\-]?", "", block, flags=re.IGNORECASE).strip()
-        lines = [
-            line.lstrip("-•0123456789.). \t").strip()
-            for line in content.splitlines()
-            if line.strip()
-        ]
-        for text in lines:
-            days[i - 1].append({"id": None, "text": text, "done": False})
+        seen.add(day)
+        end = headers[n + 1].start() if n + 1 < len(headers) else len(plan_text)
+        for text in parse_task_lines(plan_text[m.end():end]):
+            days[day - 1].append({"id": None, "text": text, "done": False})
 
     # Assign IDs
     nid = 0
@@ -275,6 +599,21 @@ def assign_missing_ids(tasks_by_day):
                 next_id += 1
     return tasks_by_day
 
+def reserve_task_ids(project: dict, count: int = 1) -> int:
+    """Reserve `count` consecutive task ids on the project and return the first one."""
+    if project.get("next_id") is None:
+        # Projects saved before next_id existed: derive it once
+        ids = [
+            t["id"]
+            for day in project.get("tasks", [])
+            for t in day
+            if t.get("id") is not None
+        ]
+        project["next_id"] = (max(ids) + 1) if ids else 0
+    first = project["next_id"]
+    project["next_id"] = first + count
+    return first
+
 # ---------------------------
 # AI plan generation
 # ---------------------------
@@ -287,7 +626,6 @@ def generate_8day_plan(title: str, desc: str):
         return False, "Project title is required.", None
 
     prompt = f"""
-    You are DayBot, an expert project planner.
     Create an 8-day detailed project plan for:
     Title: {title}
     Description: {desc}
@@ -304,37 +642,161 @@ def generate_8day_plan(title: str, desc: str):
     - Task 1
     """
 
-    ok, ai_text = call_gemini_text(prompt)
+    ok, ai_text = call_gemini_text_cached(prompt)
     if not ok:
         return False, f"{ai_text}", None
 
     parsed_days = parse_plan_to_tasks(ai_text)
     parsed_days = assign_missing_ids(parsed_days)
 
+    now = time.time()
     project = {
         "title": title.strip(),
         "description": desc.strip(),
         "tasks": parsed_days,
-        "generated_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat(),
+        "next_id": sum(len(day) for day in parsed_days),
+        "generated_at": now,
+        "updated_at": now,
         "raw_plan": ai_text.strip()
     }
 
     st.session_state.project = project
     save_user_project(st.session_state.user, project)
+    invalidate_project_context()
 
     # Switch to planner page for this session only
     st.session_state.page = "planner"
 
     return True, "AI 8-day plan generated successfully!", project
 
+def regenerate_day_prompt(project: dict, day: int) -> str:
+    current = "\n".join(f"- {t.get('text', '')}" for t in project["tasks"][day])
+    return (
+        f"Project: {project.get('title', '')}\n"
+        f"Description: {project.get('description', '')}\n\n"
+        f"Current tasks for Day {day + 1}:\n{current or '- (none)'}\n\n"
+        f"Rewrite the tasks for Day {day + 1} so they are clear and actionable. "
+        f"Reply with at most 6 lines, one task per line, each starting with '- '."
+    )
+
+# Section headers in a whole-plan rewrite: "### Day 3", "**Day 3**" or "Day 3:".
+# The whole line must be the header, so a task mentioning a day doesn't split it.
+_REGEN_SECTION_RE = re.compile(
+    r"^[ \t#*]*Day\s*(\d+)(?:\s+current)?[ \t*]*:?[ \t*]*$", re.IGNORECASE | re.MULTILINE
+)
+
+def regenerate_plan_prompt(project: dict) -> str:
+    """One prompt asking DayBot to rewrite all 8 days at once."""
+    sections = "\n".join(
+        f"### Day {d + 1} current:\n"
+        + ("\n".join(f"- {t.get('text', '')}" for t in project["tasks"][d]) or "- (none)")
+        for d in range(8)
+    )
+    return (
+        f"Project: {project.get('title', '')}\n"
+        f"Description: {project.get('description', '')}\n\n"
+        f"Rewrite each day's tasks so they are clear and actionable. Return 8 sections, "
+        f"each starting with a line '### Day N' followed by at most 6 lines of '- task'.\n\n"
+        f"{sections}"
+    )
+
+def split_day_sections(reply: str):
+    """Map day index (0-7) to the text of its 'Day N' section."""
+    headers = list(_REGEN_SECTION_RE.finditer(reply))
+    sections = {}
+    for n, m in enumerate(headers):
+        day = int(m.group(1)) - 1
+        end = headers[n + 1].start() if n + 1 < len(headers) else len(reply)
+        if 0 <= day < 8 and day not in sections:
+            sections[day] = reply[m.end():end]
+    return sections
+
+def regenerate_all_days(project: dict):
+    """Rewrite every day's tasks with DayBot in one batched request."""
+    new_lines = {}
+    ok, reply = call_gemini_text(regenerate_plan_prompt(project))
+    if ok:
+        for d, section in split_day_sections(reply).items():
+            lines = parse_task_lines(section)[:6]
+            if lines:
+                new_lines[d] = lines
+
+    # Days the batched reply skipped are retried individually, concurrently
+    missing = [d for d in range(8) if d not in new_lines]
+    if ok and missing:
+        results = call_gemini_many([regenerate_day_prompt(project, d) for d in missing])
+        for d, (day_ok, day_reply) in zip(missing, results):
+            lines = parse_task_lines(day_reply)[:6] if day_ok else []
+            if lines:
+                new_lines[d] = lines
+
+    for d, lines in new_lines.items():
+        first = reserve_task_ids(project, len(lines))
+        project["tasks"][d] = [
+            {"id": first + k, "text": text, "done": False}
+            for k, text in enumerate(lines)
+        ]
+    if new_lines:
+        mark_project_dirty()
+    failed = 8 - len(new_lines)
+    if failed:
+        st.toast(f"DayBot could not rewrite {failed} day(s); they were left unchanged.")
+
 # ---------------------------
 # DayBot contextual response
 # ---------------------------
-def ask_daybot_contextual(context, prompt):
+# "[2] ..." markers at the start of a line in a batched reply
+_NUMBERED_REPLY_RE = re.compile(r"^\[(\d+)\]\s*", re.MULTILINE)
+
+def batch_prompt(questions):
+    """Ask several independent questions in one request."""
+    numbered = "\n".join(f"[{i}] {q}" for i, q in enumerate(questions, start=1))
+    return (
+        "Answer each numbered item independently. Start each answer on a new line "
+        "with its number in brackets, e.g. [1].\n\n" + numbered
+    )
+
+def split_numbered_reply(reply: str, count: int):
+    """Split a batched reply into `count` answers, or None if DayBot ignored the numbering."""
+    parts = _NUMBERED_REPLY_RE.split(reply)
+    answers = {}
+    for num, text in zip(parts[1::2], parts[2::2]):
+        answers.setdefault(int(num), text.strip())
+    if not all(answers.get(i) for i in range(1, count + 1)):
+        return None
+    return [answers[i] for i in range(1, count + 1)]
+
+def build_project_context(project: dict) -> str:
+    """Plan, description and every task as plain text for DayBot."""
+    context_parts = [
+        project.get("raw_plan", ""),
+        project.get("description", "")
+    ]
+    for i, day in enumerate(project.get("tasks", []), start=1):
+        context_parts.append(f"Day {i}:")
+        for t in day:
+            context_parts.append(f"- {t.get('text')}")
+    return "\n".join(context_parts)
+
+def project_context(project: dict) -> str:
+    """build_project_context, kept in session_state until the project's tasks change."""
+    cached = st.session_state.get("_project_context")
+    title = project.get("title", "")
+    if cached and cached[0] == title:
+        return cached[1]
+    context = build_project_context(project)
+    st.session_state["_project_context"] = (title, context)
+    return context
+
+def ask_daybot_contextual(context, prompt, cached=False):
     combined_prompt = f"{context}\n\nUser request: {prompt}"
+    if cached:
+        return call_gemini_text_cached(combined_prompt)
     return call_gemini_text(combined_prompt)
 
+def stream_daybot_contextual(context, prompt):
+    return stream_gemini_text(f"{context}\n\nUser request: {prompt}")
+
 # ---------------------------
 # UI helpers
 # ---------------------------
@@ -344,7 +806,10 @@ BG = "#0b0710"
 TEXT = "#e9e6ee"
 MUTED = "#bdb7d9"
 
-st.markdown(f"""
+@st.cache_resource(show_spinner=False)
+def _style_html() -> str:
+    # Built once per process; the markdown still has to be emitted on every rerun
+    return f"""
 <style>
 :root {{ --accent1: {ACCENT1}; --accent2: {ACCENT2}; --bg:{BG}; --text:{TEXT}; --muted:{MUTED}; }}
 html, body, #root {{ background: linear-gradient(180deg,var(--accent2),var(--bg)) !important; color: var(--text) !important; }}
@@ -354,13 +819,17 @@ html, body, #root {{ background: linear-gradient(180deg,var(--accent2),var(--bg)
 .small {{ color: var(--muted); font-size:13px; }}
 .sidebar-spacer {{ height:200px; }}
 </style>
-""", unsafe_allow_html=True)
+"""
 
-st.markdown(
-    '<div class="header"><h2 style="margin:0">📅 DayByDay</h2>'
-    '<div class="small">Your AI project planner — DayBot</div></div>',
-    unsafe_allow_html=True
-)
+@st.cache_resource(show_spinner=False)
+def _header_html() -> str:
+    return (
+        '<div class="header"><h2 style="margin:0">📅 DayByDay</h2>'
+        '<div class="small">Your AI project planner — DayBot</div></div>'
+    )
+
+st.markdown(_style_html(), unsafe_allow_html=True)
+st.markdown(_header_html(), unsafe_allow_html=True)
 
 # ---------------------------
 # Navigation helpers
@@ -368,6 +837,32 @@ st.markdown(
 def go_to(page_name):
     st.session_state.page = page_name
 
+# Chat messages are {"role", "text", "time"}; time is epoch milliseconds
+ROLE_USER = "user"
+ROLE_BOT = "daybot"
+
+def format_chat_time(value) -> str:
+    if isinstance(value, str):
+        # Older messages stored an ISO string
+        return value[:19]
+    if not value:
+        return ""
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+# A reply mentioning both Day 1 and Day 8 is offered for import as a plan
+_DAY1_RE = re.compile(r"\bDay\s*1\b", re.IGNORECASE)
+_DAY8_RE = re.compile(r"\bDay\s*8\b", re.IGNORECASE)
+
+def looks_like_plan(text: str) -> bool:
+    return bool(_DAY1_RE.search(text) and _DAY8_RE.search(text))
+
+def append_chat_message(msg: dict):
+    """Append to the chat history; the deque drops the oldest past MAX_CHAT_HISTORY."""
+    if msg.get("role") == ROLE_BOT:
+        # Checked once here instead of on every rerun of the Chat page
+        msg["has_plan"] = looks_like_plan(msg.get("text", ""))
+    st.session_state.chat_history.append(msg)
+
 # ---------------------------
 # Pages
 # ---------------------------
@@ -388,9 +883,9 @@ def page_login_signup():
                 if projects:
                     last_title = max(
                         projects.items(),
-                        key=lambda kv: kv[1].get("updated_at", kv[1].get("generated_at", ""))
+                        key=lambda kv: project_sort_key(kv[1])
                     )[0]
-                    st.session_state.project = projects[last_title]
+                    st.session_state.project = copy.deepcopy(projects[last_title])
                 go_to("home")
             else:
                 st.error(msg)
@@ -411,19 +906,32 @@ def page_login_signup():
                 ok, msg = signup_local(su_user.strip(), su_pass)
                 if ok:
                     st.session_state.user = su_user.strip()
-                    st.session_state.project = {
-                        "title": "",
-                        "description": "",
-                        "tasks": [[] for _ in range(8)],
-                        "generated_at": None,
-                        "updated_at": None,
-                        "raw_plan": ""
-                    }
+                    st.session_state.project = empty_project()
                     go_to("home")
                     st.success("Account created; welcome!")
                 else:
                     st.error(msg)
 
+@st.fragment
+def render_project_picker(projects: dict):
+    """Project list on Home; picking a project only reruns this fragment."""
+    sorted_titles = sorted(
+        projects.keys(),
+        key=lambda t: project_sort_key(projects[t]),
+        reverse=True
+    )
+    selected = st.selectbox(
+        "Open a project",
+        options=["-- select --"] + sorted_titles,
+        key="home_proj_sel"
+    )
+    if selected != "-- select --":
+        if st.button("Open Project", key="open_proj_btn"):
+            st.session_state.project = copy.deepcopy(projects[selected])
+            go_to("planner")
+            # Leaving Home needs a full app rerun, not just this fragment
+            st.rerun()
+
 def page_home():
     st.markdown('<div class="card"><strong>Home — Overview</strong></div>', unsafe_allow_html=True)
     st.markdown(f"### Welcome, **{st.session_state.user}**")
@@ -435,32 +943,12 @@ def page_home():
         if not projects:
             st.info("No projects yet. Click Generate new project.")
         else:
-            sorted_titles = sorted(
-                projects.keys(),
-                key=lambda t: projects[t].get("updated_at", projects[t].get("generated_at", "")),
-                reverse=True
-            )
-            selected = st.selectbox(
-                "Open a project",
-                options=["-- select --"] + sorted_titles,
-                key="home_proj_sel"
-            )
-            if selected != "-- select --":
-                if st.button("Open Project", key="open_proj_btn"):
-                    st.session_state.project = projects[selected]
-                    go_to("planner")
+            render_project_picker(projects)
 
     with right:
         st.markdown("**Start**")
         if st.button("Generate new project"):
-            st.session_state.project = {
-                "title": "",
-                "description": "",
-                "tasks": [[] for _ in range(8)],
-                "generated_at": None,
-                "updated_at": None,
-                "raw_plan": ""
-            }
+            st.session_state.project = empty_project()
             st.session_state.show_planner = False
             go_to("create")
 
@@ -500,6 +988,8 @@ def page_planner():
     proj = st.session_state.project
     st.title(f"📅 Planner — {proj.get('title', '')}")
     st.caption(proj.get("description", ""))
+    if proj.get("updated_at"):
+        st.caption(f"Last saved {format_timestamp(proj['updated_at'])} UTC")
 
     raw_tasks = proj.get("tasks", [[] for _ in range(8)])
     tasks = []
@@ -510,54 +1000,82 @@ def page_planner():
     tasks = assign_missing_ids(tasks)
     proj["tasks"] = tasks
 
+    # Only the open day gets task widgets; the others are a one-line summary
+    open_day = st.session_state.get("open_day", 0)
     for i in range(8):
-        with st.expander(f"**Day {i+1}**", expanded=(i == 0)):
-            if tasks[i]:
-                for j, t in enumerate(tasks[i]):
-                    task_text = t.get("text", "")
-                    done = t.get("done", False)
-                    c1, c2 = st.columns([0.9, 0.1])
-                    new_done = c1.checkbox(
-                        task_text,
-                        value=done,
-                        key=f"done_{i}_{j}"
-                    )
-                    if new_done != done:
-                        t["done"] = new_done
-                        proj["tasks"] = tasks
-                        save_user_project(st.session_state.user, proj)
-
-                    if c2.button("❌", key=f"del_{i}_{j}"):
-                        tasks[i].pop(j)
-                        proj["tasks"] = tasks
-                        save_user_project(st.session_state.user, proj)
-                        st.toast(f"Task removed from Day {i+1}")
-                        st.experimental_rerun()
-            else:
-                st.info("No tasks yet.")
+        if i != open_day:
+            done = sum(1 for t in tasks[i] if t.get("done"))
+            c1, c2 = st.columns([0.85, 0.15])
+            c1.markdown(
+                f"**Day {i+1}** <span class='small'>{done}/{len(tasks[i])} done</span>",
+                unsafe_allow_html=True
+            )
+            if c2.button("Open", key=f"open_day_{i}"):
+                st.session_state.open_day = i
+                st.rerun()
+            continue
 
-            new_task = st.text_input(f"Add task Day {i+1}", key=f"task_input_{i}")
-            if st.button(f"Add to Day {i+1}", key=f"add_btn_{i}"):
+        with st.container(border=True):
+            st.markdown(f"**Day {i+1}**")
+            # Edits inside the form only rerun the app when one of its buttons is pressed
+            with st.form(key=f"day_form_{i}", border=False):
+                new_done = {}
+                remove_ids = set()
+                if tasks[i]:
+                    for t in tasks[i]:
+                        c1, c2 = st.columns([0.85, 0.15])
+                        new_done[t["id"]] = c1.checkbox(
+                            t.get("text", ""),
+                            value=t.get("done", False),
+                            key=f"done_{i}_{t['id']}"
+                        )
+                        if c2.checkbox("Remove", key=f"rm_{i}_{t['id']}"):
+                            remove_ids.add(t["id"])
+                else:
+                    st.info("No tasks yet.")
+
+                new_task = st.text_input(f"Add task Day {i+1}", key=f"task_input_{i}")
+                ask_options = ["-- select --"] + [t.get("text", "") for t in tasks[i]]
+                ask_sel = st.selectbox("Ask DayBot to improve", ask_options, key=f"ask_sel_{i}")
+                b1, b2 = st.columns(2)
+                save_edits = b1.form_submit_button("💾 Save edits")
+                ask_daybot = b2.form_submit_button("💬 Ask DayBot")
+
+            if save_edits or ask_daybot:
+                for t in tasks[i]:
+                    t["done"] = new_done.get(t["id"], t.get("done", False))
+                if remove_ids:
+                    tasks[i] = [t for t in tasks[i] if t["id"] not in remove_ids]
                 if new_task.strip():
-                    all_ids = [
-                        tt.get("id", -1)
-                        for dd in tasks
-                        for tt in dd
-                        if tt.get("id") is not None
-                    ]
-                    nid = (max(all_ids) + 1) if all_ids else 0
-                    tasks[i].append({"id": nid, "text": new_task.strip(), "done": False})
-                    proj["tasks"] = tasks
-                    save_user_project(st.session_state.user, proj)
-                    st.toast(f"Added to Day {i+1}")
-                    st.experimental_rerun()
+                    if len(tasks[i]) >= MAX_TASKS_PER_DAY:
+                        st.toast(f"Day {i+1} already has {MAX_TASKS_PER_DAY} tasks.")
+                    else:
+                        nid = reserve_task_ids(proj)
+                        tasks[i].append({"id": nid, "text": new_task.strip(), "done": False})
+                proj["tasks"] = tasks
+                mark_project_dirty()
+                # Clear the one-shot inputs for the next run
+                st.session_state.pop(f"task_input_{i}", None)
+                st.session_state.pop(f"ask_sel_{i}", None)
+                if ask_daybot and ask_sel != "-- select --":
+                    st.session_state.ask_context = {
+                        "project_title": proj.get("title", ""),
+                        "day": i,
+                        "task_text": ask_sel
+                    }
+                    go_to("chat")
+                st.rerun()
 
     st.markdown("---")
-    c1, c2 = st.columns(2)
+    c1, c2, c3 = st.columns(3)
     if c1.button("💾 Save Progress"):
         save_user_project(st.session_state.user, proj)
         st.success("Progress saved.")
-    if c2.button("⬅ Back to Home"):
+    if c2.button("🔄 Regenerate all days"):
+        with st.spinner("DayBot is rewriting all 8 days..."):
+            regenerate_all_days(proj)
+        st.rerun()
+    if c3.button("⬅ Back to Home"):
         go_to("home")
 
 # ---------------------------
@@ -570,103 +1088,106 @@ def page_chat():
         unsafe_allow_html=True
     )
 
-    if st.session_state.ask_context:
-        ctx = st.session_state.ask_context
-        now = datetime.utcnow().isoformat()
+    # Resolve the session_state proxy once; these objects are mutated in place below
+    proj = st.session_state.project
+    history = st.session_state.chat_history
+    ctx = st.session_state.ask_context
+    ask_now = False
+    if ctx:
+        st.info(
+            f"Queued for DayBot: improve \"{ctx.get('task_text','')}\". "
+            "It will be sent together with your next message."
+        )
+        ask_now = st.button("Ask now", key="chat_ask_now")
+
+    for msg in islice(history, max(len(history) - 100, 0), None):
+        label = "You" if msg.get("role") == ROLE_USER else "DayBot"
+        st.markdown(f"**{label} ({format_chat_time(msg.get('time'))}):** {msg.get('text')}")
 
-        prompt = (
+    st.markdown("---")
+    user_msg = st.text_input("Message to DayBot", key="chat_input")
+    send = st.button("Send", key="chat_send")
+    if send and not user_msg.strip():
+        st.warning("Type a message first.")
+        send = False
+
+    # (text shown in the transcript, question for DayBot)
+    pending = []
+    if ctx and (ask_now or send):
+        pending.append((
+            f"Improve task: {ctx.get('task_text','')}",
             f"Project: {ctx.get('project_title','')}\n"
             f"Context: Day {ctx.get('day',0)+1}\n"
             f"Task: {ctx.get('task_text','')}\n"
             f"Provide 2 improved alternatives with reasons."
-        )
-
-        planning_context = (
-            st.session_state.project.get("raw_plan", "")
-            or st.session_state.project.get("description", "")
-        )
-
-        ok, reply = ask_daybot_contextual(planning_context, prompt)
-        st.session_state.chat_history.append(
-            {"role": "user", "text": f"Improve task: {ctx.get('task_text','')}", "time": now}
-        )
-        if ok:
-            st.session_state.chat_history.append(
-                {"role": "daybot", "text": reply, "time": now}
-            )
-        else:
-            st.session_state.chat_history.append(
-                {"role": "daybot", "text": "DayBot unavailable.", "time": now}
-            )
+        ))
         st.session_state.ask_context = None
-
-    for msg in st.session_state.chat_history[-100:]:
-        label = "You" if msg.get("role") == "user" else "DayBot"
-        st.markdown(f"**{label} ({msg.get('time')[:19]}):** {msg.get('text')}")
-
-    st.markdown("---")
-    user_msg = st.text_input("Message to DayBot", key="chat_input")
-    if st.button("Send", key="chat_send"):
-        if not user_msg.strip():
-            st.warning("Type a message first.")
+    if send:
+        pending.append((user_msg.strip(), user_msg.strip()))
+
+    if pending:
+        now = int(time.time() * 1000)
+        for shown, _ in pending:
+            append_chat_message({"role": ROLE_USER, "text": shown, "time": now})
+
+        if len(pending) == 1 and not send:
+            # Task improvement on its own only needs the plan, and is safe to cache
+            planning_context = proj.get("raw_plan", "") or proj.get("description", "")
+            ok, reply = ask_daybot_contextual(planning_context, pending[0][1], cached=True)
+            replies = [reply] if ok else None
         else:
-            now = datetime.utcnow().isoformat()
-            st.session_state.chat_history.append(
-                {"role": "user", "text": user_msg.strip(), "time": now}
-            )
-
-            context_parts = [
-                st.session_state.project.get("raw_plan", ""),
-                st.session_state.project.get("description", "")
-            ]
-            for i, day in enumerate(st.session_state.project.get("tasks", []), start=1):
-                context_parts.append(f"Day {i}:")
-                for t in day:
-                    context_parts.append(f"- {t.get('text')}")
-
-            context = "\n".join(context_parts)
-            ok, reply = ask_daybot_contextual(context, user_msg.strip())
-            if ok:
-                st.session_state.chat_history.append(
-                    {"role": "daybot", "text": reply, "time": now}
-                )
+            context = project_context(proj)
+            if len(pending) == 1:
+                # Stream so the reply shows up as soon as the first tokens arrive
+                try:
+                    reply = st.write_stream(stream_daybot_contextual(context, pending[0][1]))
+                    replies = [reply.strip()] if isinstance(reply, str) and reply.strip() else None
+                except GeminiCallError:
+                    replies = None
             else:
-                st.session_state.chat_history.append(
-                    {"role": "daybot", "text": "DayBot unavailable.", "time": now}
-                )
+                # One round-trip for both questions; the reply is split back per question
+                ok, reply = ask_daybot_contextual(context, batch_prompt([q for _, q in pending]))
+                replies = (split_numbered_reply(reply, len(pending)) or [reply]) if ok else None
 
-    if st.session_state.chat_history:
-        last = st.session_state.chat_history[-1]
-        if last.get("role") == "daybot":
+        if replies is None:
+            append_chat_message({"role": ROLE_BOT, "text": "DayBot unavailable.", "time": now})
+        else:
+            for reply in replies:
+                append_chat_message({"role": ROLE_BOT, "text": reply, "time": now})
+        # Show the new messages, which are rendered above this point
+        st.rerun()
+
+    if history:
+        last = history[-1]
+        if last.get("role") == ROLE_BOT:
             txt = last.get("text", "")
-            if (
-                re.search(r"\bDay\s*1\b", txt, re.IGNORECASE) and
-                re.search(r"\bDay\s*8\b", txt, re.IGNORECASE)
-            ):
+            has_plan = last.get("has_plan")
+            if has_plan is None:
+                has_plan = looks_like_plan(txt)
+            if has_plan:
                 if st.button("Import last DayBot reply into tasks"):
                     parsed = parse_plan_to_tasks(txt)
-                    proj = st.session_state.project
-                    existing_tasks = proj.get("tasks", [[] for _ in range(8)])
-                    existing_tasks = assign_missing_ids(existing_tasks)
-                    proj["tasks"] = existing_tasks
-
-                    all_ids = [
-                        tt.get("id")
-                        for dd in proj["tasks"]
-                        for tt in dd
-                        if tt.get("id") is not None
-                    ]
-                    nid = (max(all_ids) + 1) if all_ids else 0
+                    tasks = assign_missing_ids(proj.get("tasks", [[] for _ in range(8)]))
+                    proj["tasks"] = tasks
 
+                    room = [max(MAX_TASKS_PER_DAY - len(tasks[i]), 0) for i in range(8)]
+                    incoming = [parsed[i][:room[i]] for i in range(8)]
+                    nid = reserve_task_ids(proj, sum(len(day) for day in incoming))
                     for i in range(8):
-                        for t in parsed[i]:
-                            text = t.get("text") if isinstance(t, dict) else str(t)
-                            proj["tasks"][i].append(
-                                {"id": nid, "text": text, "done": False}
+                        tasks[i].extend(
+                            {"id": nid + k, "text": t["text"], "done": False}
+                            for k, t in enumerate(incoming[i])
+                        )
+                        nid += len(incoming[i])
+                        skipped = len(parsed[i]) - len(incoming[i])
+                        if skipped:
+                            st.toast(
+                                f"Day {i+1} is full ({MAX_TASKS_PER_DAY} tasks): "
+                                f"skipped {skipped} imported task{'s' if skipped != 1 else ''}."
                             )
-                            nid += 1
 
                     save_user_project(st.session_state.user, proj)
+                    invalidate_project_context()
                     st.success("Imported into tasks.")
 
 # ---------------------------
@@ -696,36 +1217,36 @@ def render_sidebar():
         st.markdown("---")
         if st.button("Logout"):
             st.session_state.user = None
-            st.session_state.project = {
-                "title": "",
-                "description": "",
-                "tasks": [[] for _ in range(8)],
-                "generated_at": None,
-                "updated_at": None,
-                "raw_plan": ""
-            }
-            st.session_state.chat_history = []
+            st.session_state.project = empty_project()
+            st.session_state.chat_history.clear()
+            st.session_state.ask_context = None
+            st.session_state.show_planner = False
+            for key in ("login_user", "login_pass", "su_user", "su_pass", "chat_input", "_project_context"):
+                st.session_state.pop(key, None)
             go_to("login")
             st.success("Logged out.")
 
 # ---------------------------
 # Main router
 # ---------------------------
+PAGES = {
+    "home": page_home,
+    "create": page_create,
+    "planner": page_planner,
+    "chat": page_chat,
+}
+
 def main():
-    if not st.session_state.user:
-        page_login_signup()
-        return
-    render_sidebar()
-    if st.session_state.page == "home":
-        page_home()
-    elif st.session_state.page == "create":
-        page_create()
-    elif st.session_state.page == "planner":
-        page_planner()
-    elif st.session_state.page == "chat":
-        page_chat()
-    else:
-        page_home()
+    try:
+        if not st.session_state.user:
+            page_login_signup()
+            return
+        render_sidebar()
+        PAGES.get(st.session_state.page, page_home)()
+    finally:
+        # Runs on st.rerun() too, so deferred edits are never lost
+        flush_project()
 
 if __name__ == "__main__":
-    main()
+    with gc_paused():
+        main()
@@ -0,0 +1,19 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+APP_PATH = Path(__file__).resolve().parent.parent / "streamlit_app.py"
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    for name in ("streamlit", "bcrypt", "dotenv"):
+        pytest.importorskip(name)
+    mp = pytest.MonkeyPatch()
+    mp.setenv("DATA_DIR", str(tmp_path_factory.mktemp("data")))
+    spec = importlib.util.spec_from_file_location("streamlit_app", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    yield module
+    mp.undo()
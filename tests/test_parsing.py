@@ -0,0 +1,44 @@
+def texts(days):
+    return [[t["text"] for t in day] for day in days]
+
+
+def test_task_lines_strip_only_list_markers(app):
+    text = "- 2024 budget review\n1. 10-minute standup\n2) 3D print enclosure\n• * ok\n\n  * plain"
+    assert app.parse_task_lines(text) == [
+        "2024 budget review", "10-minute standup", "3D print enclosure", "* ok", "plain",
+    ]
+
+
+def test_plan_headers_in_common_shapes(app):
+    plan = (
+        "Here is your plan.\n"
+        "**Day 1:**\n- a\n"
+        "### Day 2 - Build\n- b\n"
+        "Day 3 :\n1. c\n"
+        "Day 4\n- d\n"
+    )
+    days = texts(app.parse_plan_to_tasks(plan))
+    assert days[:4] == [["a"], ["Build", "b"], ["c"], ["d"]]
+    assert [t["id"] for day in app.parse_plan_to_tasks(plan) for t in day] == list(range(5))
+
+
+def test_task_mentioning_a_day_is_not_a_header(app):
+    plan = "Day 1:\n- Day 2 prep\nDay 2 is a buffer day\nDay 2:\n- b"
+    assert texts(app.parse_plan_to_tasks(plan))[:2] == [
+        ["Day 2 prep", "Day 2 is a buffer day"], ["b"],
+    ]
+
+
+def test_rewrite_sections_in_common_shapes(app):
+    reply = "Sure!\n**Day 1**\n- a\n### Day 2\n- b\nDay 3:\n- c\n**Day 4:**\n- d\n"
+    sections = app.split_day_sections(reply)
+    assert {d: app.parse_task_lines(t) for d, t in sections.items()} == {
+        0: ["a"], 1: ["b"], 2: ["c"], 3: ["d"],
+    }
+
+
+def test_rewrite_task_mentioning_a_day_stays_in_its_section(app):
+    reply = "### Day 3\n- a\nDay 4 is about testing\n### Day 4\n- b\n"
+    sections = app.split_day_sections(reply)
+    assert app.parse_task_lines(sections[2]) == ["a", "Day 4 is about testing"]
+    assert app.parse_task_lines(sections[3]) == ["b"]
@@ -0,0 +1,63 @@
+import pytest
+
+
+@pytest.fixture
+def store(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "PROJECTS_DIR", tmp_path)
+    app._projects_store().clear()
+    yield app
+    app._projects_store().clear()
+
+
+def project(title, text="a"):
+    return {"title": title, "description": "", "tasks": [[{"id": 0, "text": text, "done": False}]]}
+
+
+def reload(app, username):
+    app._projects_store().clear()
+    return app.load_user_projects(username)
+
+
+def test_latest_save_wins_after_reload(store):
+    store.save_user_project("bob", project("P", "old"))
+    store.save_user_project("bob", project("P", "new"))
+    store.save_user_project("bob", project("Q"))
+    projects = reload(store, "bob")
+    assert sorted(projects) == ["P", "Q"]
+    assert projects["P"]["tasks"][0][0]["text"] == "new"
+
+
+def test_log_is_compacted(store):
+    for n in range(store.PROJECTS_COMPACT_MIN_LINES * 2):
+        store.save_user_project("bob", project("P", str(n)))
+    _, projects, lines, clean = store._load_projects_entry("bob")
+    assert clean and lines <= store.PROJECTS_COMPACT_MIN_LINES
+    assert reload(store, "bob")["P"]["tasks"][0][0]["text"] == str(n)
+
+
+def test_torn_last_line_is_dropped_and_rewritten(store):
+    store.save_user_project("bob", project("P"))
+    with open(store.user_projects_file("bob"), "ab") as f:
+        f.write(b'{"title": "Q", "tas')
+    assert sorted(reload(store, "bob")) == ["P"]
+    store.save_user_project("bob", project("R"))
+    rows, clean = store.read_ndjson(store.user_projects_file("bob"))
+    assert clean and sorted(row["title"] for row in rows) == ["P", "R"]
+
+
+def test_corrupt_middle_line_is_dropped_and_rewritten(store):
+    store.save_user_project("bob", project("P"))
+    with open(store.user_projects_file("bob"), "ab") as f:
+        f.write(b'{"title": "Q", "tas\n{"title": "R"}\n')
+    rows, clean = store.read_ndjson(store.user_projects_file("bob"))
+    assert not clean and [row["title"] for row in rows] == ["P", "R"]
+    store.save_user_project("bob", project("S"))
+    rows, clean = store.read_ndjson(store.user_projects_file("bob"))
+    assert clean and sorted(row["title"] for row in rows) == ["P", "R", "S"]
+
+
+def test_saved_project_is_not_aliased_by_the_cache(store):
+    proj = project("P")
+    store.save_user_project("bob", proj)
+    proj["tasks"][0][0]["done"] = True
+    assert store.load_user_projects("bob")["P"]["tasks"][0][0]["done"] is False